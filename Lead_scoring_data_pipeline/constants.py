@@ -1,12 +1,21 @@
 # You can create more variables according to your project. The following are the basic variables that have been provided to you
 DB_PATH = '/home/airflow/dags/Lead_scoring_data_pipeline/'
 DB_FILE_NAME = 'lead_scoring_data_cleaning.db'
+
+# folder holding the parquet files of the feature tables passed between tasks
+FEATURE_STORE_DIR = '/home/airflow/dags/Lead_scoring_data_pipeline/feature_store/'
 DATA_DIRECTORY = '/home/airflow/dags/Lead_scoring_data_pipeline/data/leadscoring_inference.csv'
 INTERACTION_MAPPING = '/home/airflow/dags/Lead_scoring_data_pipeline/mapping/interaction_mapping.csv'
 
 INDEX_COLUMNS =  ['created_date','city_tier', 'first_platform_c', 'first_utm_medium_c', 'first_utm_source', 'total_leads_droppped', 'referred_lead', 'app_complete_flag']
 
 
+# types the columns of the pipeline's tables are read back with, the columns
+# not listed here are read as float64
+COLUMN_DTYPES = {'created_date': 'object', 'city_mapped': 'object',
+                 'first_platform_c': 'object', 'first_utm_medium_c': 'object',
+                 'first_utm_source_c': 'object', 'app_complete_flag': 'int64'}
+
 INDEX_COLUMNS_TRAINING = ['created_date', 'city_tier', 'first_platform_c',
                 'first_utm_medium_c', 'first_utm_source_c', 'total_leads_droppped',
                 'referred_lead', 'app_complete_flag']
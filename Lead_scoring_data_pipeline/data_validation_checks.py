@@ -8,6 +8,10 @@ from schema import *
 
 import pandas as pd
 
+# the schemas are static, build their sets once at import
+_RAW_DATA_SCHEMA = frozenset(raw_data_schema)
+_MODEL_INPUT_SCHEMA = frozenset(model_input_schema)
+
 ###############################################################################
 # Define function to validate raw data's schema
 # ############################################################################## 
@@ -35,12 +39,12 @@ def raw_data_schema_check():
         raw_data_schema_check
     '''
     
-    #cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    loaded_data = pd.read_csv(DATA_DIRECTORY, index_col=[0])
+    # only the header is needed to compare the columns
+    loaded_data = pd.read_csv(DATA_DIRECTORY, index_col=[0], nrows=0)
 
-    #loaded_data = pd.read_sql('select * from loaded_data', cnx)
-    
-    check = set(loaded_data.columns) == set(raw_data_schema)
+    # a different number of columns can never match, skip hashing the names
+    check = (len(loaded_data.columns) == len(_RAW_DATA_SCHEMA)
+             and frozenset(loaded_data.columns) == _RAW_DATA_SCHEMA)
     if check:
         print('Raw datas schema is in line with the schema present in schema.py')
     else:
@@ -54,12 +58,11 @@ def raw_data_schema_check():
 def model_input_schema_check():
     '''
     This function check if all the columns mentioned in model_input_schema in 
-    schema.py are present in table named in 'model_input' in db file.
+    schema.py are present in the 'model_input' frame of the feature store.
 
    
     INPUTS
-        db_file_name : Name of the database file
-        db_path : path where the db file should be   
+        feature_store_dir : path of the folder holding the parquet files
         raw_data_schema : schema of models input data in the form oa list/tuple
                           present as in 'schema.py'
 
@@ -72,11 +75,11 @@ def model_input_schema_check():
     SAMPLE USAGE
         raw_data_schema_check
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    
-    df_model_input = pd.read_sql('select * from model_input', cnx)
-    
-    check = set(df_model_input.columns) == set(model_input_schema)
+    # only the column names are needed, read them from the parquet footer
+    model_input_columns = frame_columns('model_input')
+
+    check = (len(model_input_columns) == len(_MODEL_INPUT_SCHEMA)
+             and frozenset(model_input_columns) == _MODEL_INPUT_SCHEMA)
     if check:
         print('Models input schema is in line with the schema present in schema.py')
     else:
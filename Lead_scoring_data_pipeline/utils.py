@@ -4,7 +4,10 @@
 
 
 import pandas as pd
+import pyarrow.parquet as pq
+import numpy as np
 import os
+from contextlib import contextmanager
 
 from mapping.city_tier_mapping import city_tier_mapping
 from mapping.significant_categorical_level import *
@@ -64,6 +67,162 @@ def build_dbs():
                 conn.close()
                 return "DB Created"
 
+###############################################################################
+# Define the function to open a tuned connection to the database
+# ##############################################################################
+
+@contextmanager
+def db():
+    '''
+    This function opens a connection to the db, tunes it for the bulk reads
+    and writes done by the pipeline and closes it once the block using it
+    ends. The journal is switched to WAL so a commit no longer rewrites a
+    rollback journal, and the page cache, temp storage and memory mapping
+    are enlarged for the full table scans.
+
+
+    INPUTS
+        db_file_name : Name of the database file
+        db_path : path where the db file should be
+
+
+    SAMPLE USAGE
+        with db() as cnx:
+            df = read_table('loaded_data', cnx)
+    '''
+    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    cnx.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;"
+                      "PRAGMA cache_size=-262144; PRAGMA temp_store=MEMORY;"
+                      "PRAGMA mmap_size=268435456;")
+    try:
+        yield cnx
+    finally:
+        cnx.close()
+
+###############################################################################
+# Define the function to bulk write a dataframe into the database
+# ##############################################################################
+
+def fast_to_sqlite(df, name, cnx):
+    '''
+    This function writes a dataframe into a table of the db with a single
+    executemany() call inside one transaction. It is used instead of
+    DataFrame.to_sql() for the widest tables of the pipeline: the rows are
+    built straight from the columns' tolist() and NaN is stored as NULL by
+    sqlite itself, skipping the per chunk conversion pandas does.
+
+
+    INPUTS
+        df : dataframe to be written
+        name : name of the table. If the table already exsists then it is
+               replaced.
+        cnx : open connection to the db
+
+
+    SAMPLE USAGE
+        fast_to_sqlite(df, 'interactions_mapped', cnx)
+    '''
+    sqlite_types = {'floating': 'REAL', 'mixed-integer-float': 'REAL',
+                    'integer': 'INTEGER', 'boolean': 'INTEGER'}
+    schema = ', '.join('"{}" {}'.format(
+        column, sqlite_types.get(pd.api.types.infer_dtype(df[column], skipna=True), 'TEXT'))
+        for column in df.columns)
+    columns = ', '.join('"{}"'.format(column) for column in df.columns)
+    placeholders = ', '.join(['?'] * len(df.columns))
+
+    with cnx:
+        cnx.execute("BEGIN IMMEDIATE")
+        cnx.execute('DROP TABLE IF EXISTS "{}"'.format(name))
+        cnx.execute('CREATE TABLE "{}" ({})'.format(name, schema))
+        cnx.executemany('INSERT INTO "{}" ({}) VALUES ({})'.format(name, columns, placeholders),
+                        zip(*(df[column].tolist() for column in df.columns)))
+
+###############################################################################
+# Define the function to read a whole table from the database
+# ##############################################################################
+
+def read_table(name, cnx):
+    '''
+    This function reads a whole table of the db into a dataframe with
+    pd.read_sql_query, the type of every column pinned instead of guessed
+    from its values. The columns listed in COLUMN_DTYPES are read with their
+    type there and all the others, the interaction columns, as float64, so
+    a column holding only NULLs no longer comes back as object and gets
+    written again as TEXT.
+
+
+    INPUTS
+        name : name of the table
+        cnx : open connection to the db
+        column_dtypes : types of the columns that are not read as float64
+
+
+    SAMPLE USAGE
+        df = read_table('loaded_data', cnx)
+    '''
+    query = 'SELECT * FROM "{}"'.format(name)
+    columns = [column[0] for column in cnx.execute(query+' LIMIT 0').description]
+    dtype = {column: COLUMN_DTYPES.get(column, 'float64') for column in columns}
+    return pd.read_sql_query(query, cnx, dtype=dtype)
+
+###############################################################################
+# Define the functions to save and load frames from the feature store
+# ##############################################################################
+
+def save_frame(df, name):
+    '''
+    This function saves a dataframe in the feature store as a zstd compressed
+    parquet file named '<name>.parquet'. The feature store holds the wide
+    feature tables passed between the pipelines' tasks, which are read back
+    column wise much faster than from sqlite.
+
+
+    INPUTS
+        df : dataframe to be saved
+        name : name of the frame. If a frame with the same name already
+               exsists then it is replaced.
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        save_frame(df, 'model_input')
+    '''
+    os.makedirs(FEATURE_STORE_DIR, exist_ok=True)
+    df.to_parquet(FEATURE_STORE_DIR+name+'.parquet', compression='zstd', index=False)
+
+
+def load_frame(name):
+    '''
+    This function loads a dataframe saved in the feature store with save_frame().
+
+
+    INPUTS
+        name : name of the frame
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        df = load_frame('model_input')
+    '''
+    return pd.read_parquet(FEATURE_STORE_DIR+name+'.parquet')
+
+
+def frame_columns(name):
+    '''
+    This function returns the column names of a frame saved in the feature
+    store. Only the parquet footer is read, not the data itself.
+
+
+    INPUTS
+        name : name of the frame
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        columns = frame_columns('model_input')
+    '''
+    return pq.read_schema(FEATURE_STORE_DIR+name+'.parquet').names
+
 ###############################################################################
 # Define function to load the csv file to the database
 # ##############################################################################
@@ -92,16 +251,17 @@ def load_data_into_db():
     SAMPLE USAGE
         load_data_into_db()
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    
-    df_lead_scoring = pd.read_csv(DATA_DIRECTORY, index_col=[0])
-
-    df_lead_scoring['total_leads_droppped'] = df_lead_scoring['total_leads_droppped'].fillna(0)
-    df_lead_scoring['referred_lead'] = df_lead_scoring['referred_lead'].fillna(0)
+    # parse the csv with pyarrow's multi-threaded reader
+    df_lead_scoring = pd.read_csv(DATA_DIRECTORY, index_col=0, engine='pyarrow',
+                                  dtype={'created_date': 'str',
+                                         'total_leads_droppped': 'float32',
+                                         'referred_lead': 'float32'})
 
-    df_lead_scoring.to_sql(name='loaded_data', con=cnx, if_exists='replace', index=False)
+    df_lead_scoring.fillna({'total_leads_droppped': 0, 'referred_lead': 0}, inplace=True)
 
-    cnx.close()
+    with db() as cnx:
+        df_lead_scoring.to_sql(name='loaded_data', con=cnx, if_exists='replace',
+                               index=False, chunksize=10000)
 
 
 ###############################################################################
@@ -134,18 +294,20 @@ def map_city_tier():
         map_city_tier()
 
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    with db() as cnx:
+        df_lead_scoring = read_table('loaded_data', cnx)
 
-    df_lead_scoring = pd.read_sql('select * from loaded_data', cnx)
+        # look up the tier of every distinct city once and spread the tiers over
+        # the rows through the categorical codes. Missing cities have code -1,
+        # which picks the 3.0 appended at the end.
+        cities = df_lead_scoring["city_mapped"].astype('category')
+        tiers = cities.cat.categories.map(lambda city: city_tier_mapping.get(city, 3.0))
+        tiers = np.append(np.asarray(tiers, dtype='float32'), np.float32(3.0))
+        df_lead_scoring["city_tier"] = tiers[cities.cat.codes.to_numpy()]
+        df_lead_scoring = df_lead_scoring.drop(['city_mapped'], axis=1)
 
-    df_lead_scoring["city_tier"] = df_lead_scoring["city_mapped"].map(
-        city_tier_mapping)
-    df_lead_scoring["city_tier"] = df_lead_scoring["city_tier"].fillna(3.0)
-    df_lead_scoring = df_lead_scoring.drop(['city_mapped'], axis=1)
-
-    df_lead_scoring.to_sql(name='city_tier_mapped', con=cnx,
-                           if_exists='replace', index=False)
-    cnx.close()
+        df_lead_scoring.to_sql(name='city_tier_mapped', con=cnx,
+                               if_exists='replace', index=False, chunksize=10000)
 
 ###############################################################################
 # Define function to map insignificant categorial variables to "others"
@@ -163,9 +325,9 @@ def map_categorical_vars():
     INPUTS
         db_file_name : Name of the database file
         db_path : path where the db file should be
-        list_platform : list of all the significant platform.
-        list_medium : list of all the significat medium
-        list_source : list of all rhe significant source
+        list_platform : set of all the significant platform.
+        list_medium : set of all the significat medium
+        list_source : set of all rhe significant source
 
         **NOTE : list_platform, list_medium & list_source are all constants and
                  must be stored in 'significant_categorical_level.py'
@@ -185,41 +347,27 @@ def map_categorical_vars():
     '''
     
     
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    with db() as cnx:
+        df = read_table('city_tier_mapped', cnx)
 
-    df_lead_scoring = pd.read_sql('select * from city_tier_mapped', cnx)
-
-    new_df = df_lead_scoring[~df_lead_scoring['first_platform_c'].isin(
-        list_platform)]
-    # replace the value of these levels to others
-    new_df['first_platform_c'] = "others"
-    old_df = df_lead_scoring[df_lead_scoring['first_platform_c'].isin(
-        list_platform)]  # get rows for levels which are present in list_platform
-    # concatenate new_df and old_df to get the final dataframe
-    df = pd.concat([new_df, old_df])
-
-    # get rows for levels which are not present in list_medium
-    new_df = df[~df['first_utm_medium_c'].isin(list_medium)]
-    # replace the value of these levels to others
-    new_df['first_utm_medium_c'] = "others"
-    # get rows for levels which are present in list_medium
-    old_df = df[df['first_utm_medium_c'].isin(list_medium)]
-    # concatenate new_df and old_df to get the final dataframe
-    df = pd.concat([new_df, old_df])
-
-    # get rows for levels which are not present in list_source
-    new_df = df[~df['first_utm_source_c'].isin(list_source)]
-    # replace the value of these levels to others
-    new_df['first_utm_source_c'] = "others"
-    # get rows for levels which are present in list_source
-    old_df = df[df['first_utm_source_c'].isin(list_source)]
-    # concatenate new_df and old_df to get the final dataframe
-    df = pd.concat([new_df, old_df])
-
-    df = df.drop_duplicates()
-
-    df.to_sql(name='categorical_variables_mapped', con=cnx, if_exists='replace', index=False)
-    cnx.close()
+        # all the levels outside the significant ones are assigned to a single
+        # level called others. The columns are held as categoricals so isin()
+        # and where() work on the few distinct levels instead of every row.
+        for column, levels in (('first_platform_c', list_platform),
+                               ('first_utm_medium_c', list_medium),
+                               ('first_utm_source_c', list_source)):
+            categories = df[column].astype('category')
+            if 'others' not in categories.cat.categories:
+                categories = categories.cat.add_categories('others')
+            df[column] = categories.where(categories.isin(levels), 'others')
+
+        # some leads only become identical once their levels are mapped, so the
+        # duplicates have to be dropped here rather than at ingest. Hashing the
+        # rows in pandas is cheaper than rewriting the table with SELECT DISTINCT.
+        df = df.drop_duplicates()
+
+        df.to_sql(name='categorical_variables_mapped', con=cnx,
+                  if_exists='replace', index=False, chunksize=10000)
 
 
 ##############################################################################
@@ -236,8 +384,8 @@ def interactions_mapping():
         db_path : path where the db file should be
         interaction_mapping_file : path to the csv file containing interaction's
                                    mappings
-        index_columns : list of columns to be used as index while pivoting and
-                        unpivoting
+        index_columns : list of columns that are carried over as they are while
+                        the interaction columns are summed
         NOTE : Since while inference we will not have 'app_complete_flag' which is
         our label, we will have to exculde it from our index_columns. It is recommended 
         that you use an if loop and check if 'app_complete_flag' is present in 
@@ -252,35 +400,43 @@ def interactions_mapping():
         the function replaces it.
         
         It also drops all the features that are not requried for training model and 
-        writes it in a table named 'model_input'
+        saves it in the feature store as 'model_input'
 
     
     SAMPLE USAGE
         interactions_mapping()
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-
-    df = pd.read_sql('select * from categorical_variables_mapped', cnx)
-    
-    if 'app_complete_flag' in df.columns:
-        index_variable = INDEX_COLUMNS_TRAINING
-    else:
-        index_variable = INDEX_COLUMNS_INFERENCE
-        
-    df_event_mapping = pd.read_csv(INTERACTION_MAPPING, index_col=[0])
-    df_unpivot = pd.melt(df, id_vars=index_variable, var_name='interaction_type', value_name='interaction_value')
-    df_unpivot['interaction_value'] = df_unpivot['interaction_value'].fillna(0)
-    df = pd.merge(df_unpivot, df_event_mapping,
-                  on='interaction_type', how='left')
-    df = df.drop(['interaction_type'], axis=1)
-    df_pivot = df.pivot_table(
-        values='interaction_value', index=index_variable, columns='interaction_mapping', aggfunc='sum')
-    df_pivot = df_pivot.reset_index()
-    
-    df_pivot.to_sql(name='interactions_mapped', con=cnx, if_exists='replace', index=False)
-    
-    df_model_input = df_pivot.drop(NOT_FEATURES, axis=1)
-    df_model_input.to_sql(name='model_input', con=cnx, if_exists='replace', index=False)
-    
-    cnx.close()
+    with db() as cnx:
+        df = read_table('categorical_variables_mapped', cnx)
+
+        if 'app_complete_flag' in df.columns:
+            index_variable = INDEX_COLUMNS_TRAINING
+        else:
+            index_variable = INDEX_COLUMNS_INFERENCE
+
+        # link every interaction column to the interaction type it maps to
+        df_event_mapping = pd.read_csv(INTERACTION_MAPPING, index_col=[0])
+        interaction_mapping = df_event_mapping['interaction_mapping'].to_dict()
+        interaction_columns = [column for column in df.columns
+                               if column not in index_variable and column in interaction_mapping]
+        interactions = sorted({interaction_mapping[column] for column in interaction_columns})
+        membership = np.zeros((len(interaction_columns), len(interactions)))
+        for i, column in enumerate(interaction_columns):
+            membership[i, interactions.index(interaction_mapping[column])] = 1
+
+        # sum the columns of every interaction type with a single matrix product
+        # on the wide frame instead of unpivoting, merging the mapping and
+        # pivoting back. Missing values are filled with 0 while building the
+        # float block.
+        values = df[interaction_columns].to_numpy(dtype='float64', na_value=0)
+        df_interactions = df[index_variable].copy()
+        df_interactions[interactions] = values @ membership
+
+        # keep the rows sorted by the index columns, as pivot_table returned them
+        df_interactions = df_interactions.sort_values(index_variable, ignore_index=True)
+
+        df_model_input = df_interactions.drop(NOT_FEATURES, axis=1)
+
+        fast_to_sqlite(df_interactions, 'interactions_mapped', cnx)
+        save_frame(df_model_input, 'model_input')
    
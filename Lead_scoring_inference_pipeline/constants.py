@@ -1,6 +1,9 @@
 DB_PATH = '/home/airflow/dags/Lead_scoring_data_pipeline/'
 DB_FILE_NAME = 'lead_scoring_data_cleaning.db'
 
+# folder holding the parquet files of the feature tables passed between tasks
+FEATURE_STORE_DIR = '/home/airflow/dags/Lead_scoring_data_pipeline/feature_store/'
+
 DB_FILE_MLFLOW = '/home/airflow/dags/Lead_scoring_training_pipeline/Lead_scoring_mlflow_production.db'
 
 FILE_PATH = '/home/airflow/dags/Lead_scoring_inference_pipeline'
@@ -11,9 +11,10 @@ version: 1
 
 import mlflow
 import mlflow.sklearn
+from mlflow.tracking import MlflowClient
 import pandas as pd
-
-import sqlite3
+import pyarrow.parquet as pq
+import numpy as np
 
 import os
 import logging
@@ -24,10 +25,70 @@ sys.path.append('/home/airflow/dags/Lead_scoring_inference_pipeline')
 
 from constants import *
 
+# models loaded from the registry by this worker, keyed by (name, stage, version)
+_MODEL_CACHE = {}
+
 ###############################################################################
-# Define the function to train the model
+# Define the functions to save and load frames from the feature store
 # ##############################################################################
 
+def save_frame(df, name):
+    '''
+    This function saves a dataframe in the feature store as a zstd compressed
+    parquet file named '<name>.parquet'. The feature store holds the wide
+    feature tables passed between the pipelines' tasks, which are read back
+    column wise much faster than from sqlite.
+
+
+    INPUTS
+        df : dataframe to be saved
+        name : name of the frame. If a frame with the same name already
+               exsists then it is replaced.
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        save_frame(df, 'model_input')
+    '''
+    os.makedirs(FEATURE_STORE_DIR, exist_ok=True)
+    df.to_parquet(FEATURE_STORE_DIR+name+'.parquet', compression='zstd', index=False)
+
+
+def load_frame(name):
+    '''
+    This function loads a dataframe saved in the feature store with save_frame().
+
+
+    INPUTS
+        name : name of the frame
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        df = load_frame('model_input')
+    '''
+    return pd.read_parquet(FEATURE_STORE_DIR+name+'.parquet')
+
+
+def frame_columns(name):
+    '''
+    This function returns the column names of a frame saved in the feature
+    store. Only the parquet footer is read, not the data itself.
+
+
+    INPUTS
+        name : name of the frame
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        columns = frame_columns('model_input')
+    '''
+    return pq.read_schema(FEATURE_STORE_DIR+name+'.parquet').names
+
+###############################################################################
+# Define the function to train the model
+# ##############################################################################
 
 def encode_features():
     '''
@@ -36,50 +97,35 @@ def encode_features():
     to many scikit-learn models.
 
     INPUTS
-        db_file_name : Name of the database file 
-        db_path : path where the db file should be
+        feature_store_dir : path of the folder holding the parquet files
         ONE_HOT_ENCODED_FEATURES : list of the features that needs to be there in the final encoded dataframe
         FEATURES_TO_ENCODE: list of features  from cleaned data that need to be one-hot encoded
         **NOTE : You can modify the encode_featues function used in heart disease's inference
         pipeline for this.
 
     OUTPUT
-        1. Save the encoded features in a table - features
+        1. Save the encoded features in the feature store - features_inference
 
     SAMPLE USAGE
         encode_features()
     '''
     # read the model input data
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    df_model_input = pd.read_sql('select * from model_input', cnx)
+    df_model_input = load_frame('model_input')
 
-    # create df to hold encoded data and intermediate data
-    df_encoded = pd.DataFrame(columns=ONE_HOT_ENCODED_FEATURES)
-    df_placeholder = pd.DataFrame()
-
-    # encode the features using get_dummies()
+    # encode all the features with a single get_dummies() call
     for f in FEATURES_TO_ENCODE:
-        if(f in df_model_input.columns):
-            encoded = pd.get_dummies(df_model_input[f])
-            encoded = encoded.add_prefix(f + '_')
-            df_placeholder = pd.concat([df_placeholder, encoded], axis=1)
-        else:
+        if f not in df_model_input.columns:
             print('Feature not found')
             return df_model_input
+    df_encoded = pd.get_dummies(df_model_input, columns=FEATURES_TO_ENCODE,
+                                prefix_sep='_', dtype=np.uint8)
 
-    # add the encoded features into a single dataframe
-    for feature in df_encoded.columns:
-        if feature in df_model_input.columns:
-            df_encoded[feature] = df_model_input[feature]
-        if feature in df_placeholder.columns:
-            df_encoded[feature] = df_placeholder[feature]
-    df_encoded.fillna(0, inplace=True)
-
-    # save the features and target in separate tables
-    df_encoded.to_sql(name='features_inference', con=cnx,
-                       if_exists='replace', index=False)
+    # keep the expected features in order, adding levels absent from the data
+    # as uint8 like the other one-hot columns
+    df_encoded = df_encoded.reindex(columns=ONE_HOT_ENCODED_FEATURES, fill_value=np.uint8(0))
 
-    cnx.close()
+    # save the features in the feature store
+    save_frame(df_encoded, 'features_inference')
 
 ###############################################################################
 # Define the function to load the model from mlflow model registry
@@ -92,15 +138,15 @@ def get_models_prediction():
     the latest version of the model present in the production stage. 
 
     INPUTS
-        db_file_name : Name of the database file
-        db_path : path where the db file should be
+        feature_store_dir : path of the folder holding the parquet files
         model from mlflow model registry
         model name: name of the model to be loaded
         stage: stage from which the model needs to be loaded i.e. production
 
 
     OUTPUT
-        Store the predicted values along with input data into a table
+        Store the predicted values along with input data in the feature store
+        as 'predicted_values'
 
     SAMPLE USAGE
         load_model()
@@ -108,22 +154,26 @@ def get_models_prediction():
     # set the tracking uri
     mlflow.set_tracking_uri(TRACKING_URI)
 
-    # load the latest model from production stage
-    loaded_model = mlflow.pyfunc.load_model(
-        model_uri=f"models:/{MODEL_NAME}/{STAGE}")
+    # load the latest model from production stage, reusing the one already
+    # loaded by this worker unless a newer version has been promoted since
+    client = MlflowClient()
+    version = client.get_latest_versions(MODEL_NAME, stages=[STAGE])[0].version
+    key = (MODEL_NAME, STAGE, version)
+    if key not in _MODEL_CACHE:
+        _MODEL_CACHE.clear()
+        _MODEL_CACHE[key] = mlflow.pyfunc.load_model(
+            model_uri=f"models:/{MODEL_NAME}/{version}")
+    loaded_model = _MODEL_CACHE[key]
 
     # read the new data
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    df_new_data = pd.read_sql('select * from features_inference', cnx)
+    df_new_data = load_frame('features_inference')
 
     # run the model to generate the prediction on new data
     y_pred = loaded_model.predict(df_new_data)
     df_new_data['pred_app_complete_flag'] = y_pred
 
-    # store the data in a table
-    df_new_data.to_sql(name='predicted_values', con=cnx,
-                       if_exists='replace', index=False)
-    cnx.close()
+    # store the data in the feature store
+    save_frame(df_new_data, 'predicted_values')
 
 
 ###############################################################################
@@ -142,8 +192,7 @@ def prediction_ratio_check():
     
 
     INPUTS
-        db_file_name : Name of the database file
-        db_path : path where the db file should be
+        feature_store_dir : path of the folder holding the parquet files
 
     OUTPUT
         Write the output of the monitoring check in prediction_distribution.txt with 
@@ -154,8 +203,7 @@ def prediction_ratio_check():
     '''
 
     # read the input data
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    df = pd.read_sql('select * from predicted_values', cnx)
+    df = load_frame('predicted_values')
 
     # get the distribution of categories in prediction col
     value_counts = df['pred_app_complete_flag'].value_counts(normalize=True)
@@ -178,8 +226,7 @@ def input_features_check():
     columns in input data.
 
     INPUTS
-        db_file_name : Name of the database file
-        db_path : path where the db file should be
+        feature_store_dir : path of the folder holding the parquet files
         ONE_HOT_ENCODED_FEATURES: List of all the features which need to be present
         in our input data.
 
@@ -193,11 +240,11 @@ def input_features_check():
         input_col_check()
     '''
     # read the input data
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    df = pd.read_sql('select * from features_inference', cnx)
+    # only the column names are needed, read them from the parquet footer
+    columns = frame_columns('features_inference')
 
     # check if all columns are present
-    check = set(df.columns) == set(ONE_HOT_ENCODED_FEATURES)
+    check = set(columns) == set(ONE_HOT_ENCODED_FEATURES)
 
     if check:
         print('All the models input are present')
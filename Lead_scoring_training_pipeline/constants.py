@@ -1,6 +1,13 @@
 DB_PATH = '/home/airflow/dags/Lead_scoring_data_pipeline/'
 DB_FILE_NAME = 'lead_scoring_data_cleaning.db'
 
+# folder holding the parquet files of the feature tables passed between tasks
+FEATURE_STORE_DIR = '/home/airflow/dags/Lead_scoring_data_pipeline/feature_store/'
+
+# keep a copy of the encoded features and target in the feature store when
+# training with encode_and_train()
+SAVE_ENCODED_FEATURES = True
+
 DB_FILE_MLFLOW = 'Lead_scoring_mlflow_production.db'
 
 TRACKING_URI = "http://0.0.0.0:6006"
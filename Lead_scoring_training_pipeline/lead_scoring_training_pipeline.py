@@ -30,22 +30,9 @@ ML_training_dag = DAG(
 )
 
 ###############################################################################
-# Create a task for encode_features() function with task_id 'encoding_categorical_variables'
+# Create a task for encode_and_train() function with task_id 'encoding_and_training_model'
 # ##############################################################################
-encoding_categorical_variables = PythonOperator(
-        task_id = 'encoding_categorical_variables',
-        python_callable = encode_features,
+encoding_and_training_model = PythonOperator(
+        task_id = 'encoding_and_training_model',
+        python_callable = encode_and_train,
         dag = ML_training_dag)
-###############################################################################
-# Create a task for get_trained_model() function with task_id 'training_model'
-# ##############################################################################
-training_model = PythonOperator(
-        task_id = 'training_model',
-        python_callable = get_trained_model,
-        dag = ML_training_dag)
-
-###############################################################################
-# Define relations between tasks
-# ##############################################################################
-encoding_categorical_variables >> training_model
-
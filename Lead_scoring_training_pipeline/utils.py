@@ -1,6 +1,6 @@
 '''
 filename: utils.py
-functions: encode_features, get_train_model
+functions: encode_features, get_train_model, encode_and_train
 creator: shashank.gupta
 version: 1
 '''
@@ -11,9 +11,8 @@ version: 1
 
 import pandas as pd
 import numpy as np
-
-import sqlite3
-from sqlite3 import Error
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 import mlflow
 import mlflow.sklearn
@@ -27,10 +26,92 @@ from sklearn.metrics import accuracy_score
 from constants import *
 
 
+###############################################################################
+# Define the functions to save and load frames from the feature store
+# ##############################################################################
+
+def save_frame(df, name):
+    '''
+    This function saves a dataframe in the feature store as a zstd compressed
+    parquet file named '<name>.parquet'. The feature store holds the wide
+    feature tables passed between the pipelines' tasks, which are read back
+    column wise much faster than from sqlite.
+
+
+    INPUTS
+        df : dataframe to be saved
+        name : name of the frame. If a frame with the same name already
+               exsists then it is replaced.
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        save_frame(df, 'model_input')
+    '''
+    os.makedirs(FEATURE_STORE_DIR, exist_ok=True)
+    df.to_parquet(FEATURE_STORE_DIR+name+'.parquet', compression='zstd', index=False)
+
+
+def load_frame(name):
+    '''
+    This function loads a dataframe saved in the feature store with save_frame().
+
+
+    INPUTS
+        name : name of the frame
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    SAMPLE USAGE
+        df = load_frame('model_input')
+    '''
+    return pd.read_parquet(FEATURE_STORE_DIR+name+'.parquet')
+
 ###############################################################################
 # Define the function to encode features
 # ##############################################################################
 
+def one_hot_encode(df_model_input):
+    '''
+    This function one hot encodes the model input dataframe and splits it into
+    the features and the target. It is shared by encode_features() and
+    encode_and_train().
+
+
+    INPUTS
+        df_model_input : dataframe read from the 'model_input' frame
+        ONE_HOT_ENCODED_FEATURES : list of the features that needs to be there in the final encoded dataframe
+        FEATURES_TO_ENCODE: list of features  from cleaned data that need to be one-hot encoded
+
+
+    OUTPUT
+        The features and the target dataframes, or None if one of the features
+        to encode is missing from the input
+
+
+    SAMPLE USAGE
+        df_features, df_target = one_hot_encode(df_model_input)
+    '''
+    for f in FEATURES_TO_ENCODE:
+        if f not in df_model_input.columns:
+            print('Feature not found')
+            return None
+
+    # encode all the features with a single get_dummies() call
+    df_encoded = pd.get_dummies(df_model_input, columns=FEATURES_TO_ENCODE,
+                                prefix_sep='_', dtype=np.uint8)
+
+    # keep the expected features in order, adding levels absent from the data
+    # as uint8 like the other one-hot columns
+    df_encoded = df_encoded.reindex(columns=ONE_HOT_ENCODED_FEATURES, fill_value=np.uint8(0))
+
+    # split the features and target. The one-hot columns are already uint8
+    # and the binary target fits in an int8.
+    df_features = df_encoded.drop(['app_complete_flag'], axis=1)
+    df_target = df_encoded[['app_complete_flag']].astype(np.int8)
+    return df_features, df_target
+
+
 def encode_features():
     '''
     This function one hot encodes the categorical features present in our  
@@ -38,15 +119,14 @@ def encode_features():
     to many scikit-learn models.
 
     INPUTS
-        db_file_name : Name of the database file 
-        db_path : path where the db file should be
+        feature_store_dir : path of the folder holding the parquet files
         ONE_HOT_ENCODED_FEATURES : list of the features that needs to be there in the final encoded dataframe
         FEATURES_TO_ENCODE: list of features  from cleaned data that need to be one-hot encoded
        
 
     OUTPUT
-        1. Save the encoded features in a table - features
-        2. Save the target variable in a separate table - target
+        1. Save the encoded features in the feature store - features
+        2. Save the target variable in the feature store - target
 
 
     SAMPLE USAGE
@@ -56,56 +136,32 @@ def encode_features():
         pipeline from the pre-requisite module for this.
     '''
     # read the model input data
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    df_model_input = pd.read_sql('select * from model_input', cnx)
-
-    # create df to hold encoded data and intermediate data
-    df_encoded = pd.DataFrame(columns=ONE_HOT_ENCODED_FEATURES)
-    df_placeholder = pd.DataFrame()
+    df_model_input = load_frame('model_input')
 
-    # encode the features using get_dummies()
-    for f in FEATURES_TO_ENCODE:
-        if(f in df_model_input.columns):
-            encoded = pd.get_dummies(df_model_input[f])
-            encoded = encoded.add_prefix(f + '_')
-            df_placeholder = pd.concat([df_placeholder, encoded], axis=1)
-        else:
-            print('Feature not found')
-            return df_model_input
-
-    # add the encoded features into a single dataframe
-    for feature in df_encoded.columns:
-        if feature in df_model_input.columns:
-            df_encoded[feature] = df_model_input[feature]
-        if feature in df_placeholder.columns:
-            df_encoded[feature] = df_placeholder[feature]
-    df_encoded.fillna(0, inplace=True)
+    encoded = one_hot_encode(df_model_input)
+    if encoded is None:
+        return df_model_input
 
-    # save the features and target in separate tables
-    df_features = df_encoded.drop(['app_complete_flag'], axis=1)
-    df_target = df_encoded[['app_complete_flag']]
-    df_features.to_sql(name='features', con=cnx,
-                       if_exists='replace', index=False)
-    df_target.to_sql(name='target', con=cnx, if_exists='replace', index=False)
-
-    cnx.close()
+    # save the features and target in separate frames
+    df_features, df_target = encoded
+    save_frame(df_features, 'features')
+    save_frame(df_target, 'target')
 
 
 ###############################################################################
 # Define the function to train the model
 # ##############################################################################
 
-def get_trained_model():
+def train_model(df_features, df_target):
     '''
-    This function setups mlflow experiment to track the run of the training pipeline. It 
-    also trains the model based on the features created in the previous function and 
-    logs the train model into mlflow model registry for prediction. The input dataset is split
-    into train and test data and the auc score calculated on the test data and
-    recorded as a metric in mlflow run.   
+    This function trains the LightGBM model on the given features and target
+    and tracks the run in mlflow. It is shared by get_trained_model() and
+    encode_and_train().
+
 
     INPUTS
-        db_file_name : Name of the database file
-        db_path : path where the db file should be
+        df_features : dataframe of the encoded features
+        df_target : dataframe of the target
 
 
     OUTPUT
@@ -114,18 +170,14 @@ def get_trained_model():
         Logs the metrics and parameters into mlflow run
         Calculate auc from the test data and log into mlflow run  
 
+
     SAMPLE USAGE
-        get_trained_model()
+        train_model(df_features, df_target)
     '''
     # set the tracking uri and experiment
     mlflow.set_tracking_uri(TRACKING_URI)
     mlflow.set_experiment(EXPERIMENT)
 
-    # read the input data
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    df_features = pd.read_sql('select * from features', cnx)
-    df_target = pd.read_sql('select * from target', cnx)
-
     # split the dataset into train and test
     X_train, X_test, y_train, y_test = train_test_split(
         df_features, df_target, test_size=0.3, random_state=0)
@@ -150,4 +202,78 @@ def get_trained_model():
         auc = roc_auc_score(y_pred, y_test)
         mlflow.log_metric('auc', auc)
 
-   
+
+def get_trained_model():
+    '''
+    This function setups mlflow experiment to track the run of the training pipeline. It 
+    also trains the model based on the features created in the previous function and 
+    logs the train model into mlflow model registry for prediction. The input dataset is split
+    into train and test data and the auc score calculated on the test data and
+    recorded as a metric in mlflow run.   
+
+    INPUTS
+        feature_store_dir : path of the folder holding the parquet files
+
+
+    OUTPUT
+        Tracks the run in experiment named 'Lead_Scoring_Training_Pipeline'
+        Logs the trained model into mlflow model registry with name 'LightGBM'
+        Logs the metrics and parameters into mlflow run
+        Calculate auc from the test data and log into mlflow run  
+
+    SAMPLE USAGE
+        get_trained_model()
+    '''
+    # read the input data
+    df_features = load_frame('features')
+    df_target = load_frame('target')
+
+    train_model(df_features, df_target)
+
+
+###############################################################################
+# Define the function to encode the features and train the model in one task
+# ##############################################################################
+
+def encode_and_train():
+    '''
+    This function runs encode_features() and get_trained_model() in a single
+    task. The encoded features are kept in memory and passed straight to the
+    model instead of being written to the feature store and read back.
+
+
+    INPUTS
+        feature_store_dir : path of the folder holding the parquet files
+        SAVE_ENCODED_FEATURES : if True the features and target are also saved
+                                in the feature store, in a background thread
+                                while the model trains
+
+
+    OUTPUT
+        Same as get_trained_model(). When SAVE_ENCODED_FEATURES is True the
+        'features' and 'target' frames are saved as in encode_features()
+
+
+    SAMPLE USAGE
+        encode_and_train()
+    '''
+    # read the model input data
+    df_model_input = load_frame('model_input')
+
+    encoded = one_hot_encode(df_model_input)
+    if encoded is None:
+        return df_model_input
+    df_features, df_target = encoded
+
+    def save_encoded():
+        save_frame(df_features, 'features')
+        save_frame(df_target, 'target')
+
+    # the saved frames are only kept for auditing, write them alongside the
+    # training instead of before it. result() re-raises any error of the
+    # write so the task fails instead of leaving the previous run's frames.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        saved = executor.submit(save_encoded) if SAVE_ENCODED_FEATURES else None
+        train_model(df_features, df_target)
+        if saved is not None:
+            saved.result()
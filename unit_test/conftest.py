@@ -0,0 +1,116 @@
+"""
+Import the necessary modules
+##############################################################################
+"""
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from constants import DB_PATH, UNIT_TEST_DB_FILE_NAME
+
+# URI of the db holding the test cases, built once at import. The file never
+# changes during the tests, so it is opened read only and immutable, without
+# any locking or journal checks.
+UNIT_TEST_DB_URI = Path(DB_PATH, UNIT_TEST_DB_FILE_NAME).absolute().as_uri()+'?mode=ro&nolock=1&immutable=1'
+
+# in-memory dbs replacing the pipeline's output db and holding a copy of the
+# test cases during the tests
+PIPELINE_DB_MEMORY_URI = 'file:pipeline?mode=memory&cache=shared'
+UNIT_TEST_DB_MEMORY_URI = 'file:unit_test_cases?mode=memory&cache=shared'
+
+###############################################################################
+# Open the in-memory db the pipeline writes to for the whole test session
+# ##############################################################################
+
+@pytest.fixture(scope="session")
+def memory_db():
+    """_summary_
+    This fixture opens the shared in-memory db the pipeline's stages write to
+    during the tests, instead of the db file, and yields the connection the
+    stages are given. The db lives as long as this connection stays open.
+
+    INPUT
+        pipeline_db_memory_uri : URI of the in-memory db
+
+    """
+    connection = sqlite3.connect(PIPELINE_DB_MEMORY_URI, uri=True)
+    yield connection
+    connection.close()
+
+
+###############################################################################
+# Define the db connections shared by the tests of a module
+# ##############################################################################
+
+@pytest.fixture(scope="module")
+def test_cases_db():
+    """_summary_
+    This fixture copies the db holding the test cases once into a shared
+    in-memory db and yields a connection to that copy. The copy lives as long
+    as this connection stays open.
+
+    INPUT
+        db_path : path at which the db holding the test cases is present
+        unit_test_db_file_name : name of the db file holding the test cases
+
+    SAMPLE USAGE
+        def expected_digests(test_cases_db):
+
+    """
+    connection = sqlite3.connect(UNIT_TEST_DB_MEMORY_URI, uri=True)
+    source = sqlite3.connect(UNIT_TEST_DB_URI, uri=True)
+    source.backup(connection)
+    source.close()
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="module")
+def connect_with_test_cases(test_cases_db):
+    """_summary_
+    This fixture returns a function opening a read only connection to a db
+    written by the pipeline, given its URI, with the in-memory copy of the
+    test cases attached to it as 'ut'. The connections it opened are closed
+    once the module's tests are done.
+
+    INPUT
+        test_cases_db : connection to the in-memory copy of the test cases
+
+    SAMPLE USAGE
+        connection = connect_with_test_cases(PIPELINE_DB_MEMORY_URI)
+
+    """
+    connections = []
+
+    def connect(uri):
+        # the tests only read the pipeline's tables, the stages write them
+        # through their own connection
+        connection = sqlite3.connect(uri, uri=True)
+        connection.executescript("PRAGMA query_only=1; PRAGMA temp_store=MEMORY;")
+        # the test cases are compared inside sqlite, next to the pipeline's tables
+        connection.execute("ATTACH DATABASE ? AS ut", (UNIT_TEST_DB_MEMORY_URI,))
+        connections.append(connection)
+        return connection
+
+    yield connect
+    for connection in connections:
+        connection.close()
+
+
+@pytest.fixture(scope="module")
+def cnx(memory_db, connect_with_test_cases):
+    """_summary_
+    This fixture opens one read only connection to the in-memory db written
+    by the pipeline and shares it between all the tests of a module. The
+    in-memory copy of the test cases is attached to it as 'ut'.
+
+    INPUT
+        memory_db : connection keeping the in-memory db written by the pipeline open
+        connect_with_test_cases : function opening the connection
+
+    SAMPLE USAGE
+        def test_stage(cnx, table, test_case, stage):
+
+    """
+    return connect_with_test_cases(PIPELINE_DB_MEMORY_URI)
@@ -2,131 +2,304 @@
 Import the necessary modules
 ##############################################################################
 """
-from utils import *
-from constants import *
-from city_tier_mapping import *
+import hashlib
+import importlib
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from utils import load_data_into_db, map_city_tier, map_categorical_vars, interactions_mapping
 
 ###############################################################################
-# Write test cases for load_data_into_db() function
+# Define the helper comparing a pipeline table with its test case
 # ##############################################################################
 
-def test_load_data_into_db():
+def _columns(cnx, table):
+    """_summary_
+    This function returns the column names of a table, read from the
+    description of a query that fetches no rows.
+
+    INPUT
+        cnx : connection to the db holding the table
+        table : name of the table, prefixed with its schema if attached
+
+    SAMPLE USAGE
+        columns = _columns(cnx, 'ut.loaded_data_test_case')
+
+    """
+    return [column[0] for column in cnx.execute(f'SELECT * FROM {table} LIMIT 0').description]
+
+
+def _dump_digests(cnx, tables):
     """_summary_
-    This function checks if the load_data_into_db function is working properly by
-    comparing its output with test cases provided in the db in a table named
-    'loaded_data_test_case'
+    This function hashes tables of the main db of a connection from the SQL
+    text iterdump() writes for them, in a single pass over the dump. Only the
+    values of the INSERT statements are hashed, so a table and its test case
+    get the same digest whatever their names. The column names are part of
+    the digest as well.
 
     INPUT
-        db_path : path at which db file is supposed to be created/present
-        db_file_name : name of the db file
+        cnx : connection to the db holding the tables in its main schema
+        tables : names of the tables to hash
 
     SAMPLE USAGE
-        output=test_get_data()
+        digests = _dump_digests(cnx, ['loaded_data', 'city_tier_mapped'])
 
     """
-    
-    load_data_into_db()
+    hashes = {}
+    for table in tables:
+        hashes[table] = hashlib.blake2b(repr(_columns(cnx, f'"{table}"')).encode(), digest_size=16)
 
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    loaded_data = pd.read_sql('select * from loaded_data', cnx)
-    
-    cnx_ut = sqlite3.connect(DB_PATH+UNIT_TEST_DB_FILE_NAME)
-    test_case = pd.read_sql('select * from loaded_data_test_case', cnx_ut)
-    
-    cnx.close()
-    cnx_ut.close()
-    
-    assert test_case.equals(loaded_data)
+    # every row is dumped as 'INSERT INTO "<table>" VALUES(...);' in rowid
+    # order, the schema and transaction lines are skipped
+    for line in cnx.iterdump():
+        if not line.startswith('INSERT INTO "'):
+            continue
+        table, values = line[len('INSERT INTO "'):].split('" VALUES', 1)
+        if table in hashes:
+            hashes[table].update(values.encode())
+    return {table: h.digest() for table, h in hashes.items()}
+
+
+def _read_rows(cnx, sql):
+    """_summary_
+    This function reads the rows returned by a query into a dataframe straight
+    from the cursor with DataFrame.from_records(), skipping the type sniffing
+    done by pd.read_sql(). It is only used to show the differing rows when a
+    test fails.
+
+    INPUT
+        cnx : connection to the db holding the table
+        sql : query returning the rows to read
+
+    SAMPLE USAGE
+        df = _read_rows(cnx, 'SELECT * FROM loaded_data')
+
+    """
+    cursor = cnx.execute(sql)
+    columns = [column[0] for column in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+
+def _count_rows(cnx, table, test_case, ordered=False):
+    """_summary_
+    This function counts with a single query the rows of a pipeline's table,
+    the rows of its test case and the distinct rows they have in common. The
+    tables hold the same rows when the three counts are equal. With ordered
+    set, the rowid is compared along with the rows, so the rows also have to
+    come in the same order.
+
+    INPUT
+        cnx : connection to the pipeline's db with the test cases attached as 'ut'
+        table : name of the table written by the pipeline
+        test_case : name of the test case table
+        ordered : whether the rows have to come in the same order
+
+    SAMPLE USAGE
+        n_table, n_test_case, n_common = _count_rows(cnx, 'loaded_data', 'loaded_data_test_case')
+
+    """
+    columns = 'rowid, *' if ordered else '*'
+    return cnx.execute(f"""
+        SELECT (SELECT COUNT(*) FROM {table}),
+               (SELECT COUNT(*) FROM ut.{test_case}),
+               (SELECT COUNT(*) FROM (SELECT {columns} FROM {table}
+                                      INTERSECT SELECT {columns} FROM ut.{test_case}))
+        """).fetchone()
+
+
+def _describe_differences(cnx, table, test_case):
+    """_summary_
+    This function builds the assertion message of a failed comparison with the
+    row counts of the pipeline's table and its test case and, when their rows
+    differ, the rows found in only one of them.
+
+    INPUT
+        cnx : connection to the pipeline's db with the test cases attached as 'ut'
+        table : name of the table written by the pipeline
+        test_case : name of the test case table
+
+    SAMPLE USAGE
+        assert actual == expected, _describe_differences(cnx, 'loaded_data', 'loaded_data_test_case')
+
+    """
+    n_table, n_test_case, n_common = _count_rows(cnx, table, test_case)
+    summary = (f"{table}: {n_table} rows, {test_case}: {n_test_case} rows, "
+               f"{n_common} distinct rows in common")
+    if n_table == n_test_case == n_common:
+        return f"{summary}. The tables hold the same rows in a different order or with other column types"
+
+    only_table = _read_rows(cnx, f"SELECT * FROM {table} EXCEPT SELECT * FROM ut.{test_case}")
+    only_test_case = _read_rows(cnx, f"SELECT * FROM ut.{test_case} EXCEPT SELECT * FROM {table}")
+    return (f"{summary}\nrows only in {table}:\n{only_table}\n"
+            f"rows only in {test_case}:\n{only_test_case}")
 
 
 ###############################################################################
-# Write test cases for map_city_tier() function
+# Run the pipeline once for all the test cases
 # ##############################################################################
-def test_map_city_tier():
+
+# table written by each stage of the pipeline and its test case
+CASES = [('loaded_data', 'loaded_data_test_case', load_data_into_db),
+         ('city_tier_mapped', 'city_tier_mapped_test_case', map_city_tier),
+         ('categorical_variables_mapped', 'categorical_variables_mapped_test_case',
+          map_categorical_vars),
+         ('interactions_mapped', 'interactions_mapped_test_case', interactions_mapping)]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def run_pipeline(memory_db):
     """_summary_
-    This function checks if map_city_tier function is working properly by
-    comparing its output with test cases provided in the db in a table named
-    'city_tier_mapped_test_case'
+    This fixture runs every stage of the pipeline once, in order, before the
+    tables they write are compared with their test cases. The stages share
+    the connection to the in-memory db set up in conftest.py.
 
     INPUT
-        db_path : path at which db file is supposed to be created/present
-        db_file_name : name of the db file
+        memory_db : connection to the in-memory db written by the pipeline
+
+    """
+    for _, _, stage in CASES:
+        stage(conn=memory_db)
 
-    SAMPLE USAGE
-        output=test_map_city_tier()
+
+@pytest.fixture(scope="module")
+def expected_digests(test_cases_db):
+    """_summary_
+    This fixture returns the digest of every test case table, all hashed from
+    a single dump of the in-memory copy of the test cases.
+
+    INPUT
+        test_cases_db : connection to the in-memory copy of the test cases
+
+    """
+    return _dump_digests(test_cases_db, [test_case for _, test_case, _ in CASES])
+
+
+@pytest.fixture(scope="module")
+def actual_digests(cnx):
+    """_summary_
+    This fixture returns the digest of every table written by the pipeline,
+    all hashed from a single dump of the pipeline's db.
+
+    INPUT
+        cnx : connection to the pipeline's db with the test cases attached as 'ut'
 
     """
-    
-    map_city_tier()
-    
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    city_tier_mapped_df = pd.read_sql('select * from city_tier_mapped', cnx)
-    
-    cnx_ut = sqlite3.connect(DB_PATH+UNIT_TEST_DB_FILE_NAME)
-    test_case = pd.read_sql('select * from city_tier_mapped_test_case', cnx_ut)
-    
-    cnx.close()
-    cnx_ut.close()
-    
-    assert test_case.equals(city_tier_mapped_df)
+    return _dump_digests(cnx, [table for table, _, _ in CASES])
+
 
 ###############################################################################
-# Write test cases for map_categorical_vars() function
-# ##############################################################################    
-def test_map_categorical_vars():
+# Write the test case for every stage of the pipeline
+# ##############################################################################
+
+@pytest.mark.parametrize('table,test_case,stage', CASES,
+                         ids=[stage.__name__ for _, _, stage in CASES])
+def test_stage(cnx, expected_digests, actual_digests, table, test_case, stage):
     """_summary_
-    This function checks if map_cat_vars function is working properly by
-    comparing its output with test cases provided in the db in a table named
-    'categorical_variables_mapped_test_case'
+    This function checks if a stage of the pipeline is working properly by
+    comparing the table it wrote with the test case provided in the db, e.g.
+    'loaded_data' written by load_data_into_db() with 'loaded_data_test_case'
 
     INPUT
-        db_path : path at which db file is supposed to be created/present
-        db_file_name : name of the db file
+        cnx : connection to the pipeline's db with the test cases attached as 'ut'
+        expected_digests : digests of the test case tables
+        actual_digests : digests of the tables written by the pipeline
+        table : name of the table written by the stage
+        test_case : name of the test case table
+        stage : function of the pipeline that wrote the table
+
+    """
+    assert actual_digests[table] == expected_digests[test_case], _describe_differences(cnx, table, test_case)
 
-    SAMPLE USAGE
-        output=test_map_cat_vars()
-
-    """    
-    
-    map_categorical_vars()
-    
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
-    categorical_variable_mapped = pd.read_sql('select * from categorical_variables_mapped', cnx)
-    
-    cnx_ut = sqlite3.connect(DB_PATH+UNIT_TEST_DB_FILE_NAME)
-    test_case = pd.read_sql('select * from categorical_variables_mapped_test_case', cnx_ut)
-    
-    cnx.close()
-    cnx_ut.close()
-    
-    assert test_case.equals(categorical_variable_mapped)
 
 ###############################################################################
-# Write test cases for interactions_mapping() function
-# ##############################################################################    
-def test_interactions_mapping():
+# Run the data pipeline airflow runs once on the test data
+# ##############################################################################
+
+# folder of the data pipeline run by airflow, whose utils.py is tested below
+# next to the copy kept with the tests
+PIPELINE_DIR = Path(__file__).resolve().parent.parent / 'Lead_scoring_data_pipeline'
+
+# the data pipeline no longer regroups the rows of categorical_variables_mapped
+# mapped to 'others', so only the rows of that table are compared, not their order
+UNORDERED_TABLES = ['categorical_variables_mapped']
+
+
+@pytest.fixture(scope="module")
+def pipeline_utils(tmp_path_factory):
     """_summary_
-    This function checks if test_column_mapping function is working properly by
-    comparing its output with test cases provided in the db in a table named
-    'interactions_mapped_test_case'
+    This fixture imports the data pipeline's utils.py next to its own
+    constants and mappings, points it at a temporary folder and runs every
+    stage once on the test data. The test csv has no index column, which the
+    pipeline reads from the raw data, so a copy with one is written first.
 
     INPUT
-        db_path : path at which db file is supposed to be created/present
-        db_file_name : name of the db file
+        pipeline_dir : folder of the data pipeline
 
-    SAMPLE USAGE
-        output=test_column_mapping()
-
-    """ 
-    interactions_mapping()
-    
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)    
-    interactions_mapped = pd.read_sql('select * from interactions_mapped', cnx)
-    
-    cnx_ut = sqlite3.connect(DB_PATH+UNIT_TEST_DB_FILE_NAME)
-    test_case = pd.read_sql('select * from interactions_mapped_test_case', cnx_ut)
-    
-    cnx.close()
-    cnx_ut.close()
-    
-    assert test_case.equals(interactions_mapped)
\ No newline at end of file
+    """
+    tmp_path = tmp_path_factory.mktemp('data_pipeline')
+    data_directory = tmp_path / 'leadscoring_test.csv'
+    pd.read_csv(Path(__file__).resolve().parent / 'leadscoring_test.csv').to_csv(data_directory)
+
+    # the pipeline's modules share their names with the ones of the tests,
+    # import them on their own and put the tests' modules back afterwards
+    with pytest.MonkeyPatch.context() as mp:
+        mp.syspath_prepend(str(PIPELINE_DIR))
+        for name in ['constants', 'utils']:
+            mp.delitem(sys.modules, name, raising=False)
+        module = importlib.import_module('utils')
+
+    module.DB_PATH = str(tmp_path)+'/'
+    module.DATA_DIRECTORY = str(data_directory)
+    module.FEATURE_STORE_DIR = str(tmp_path / 'feature_store')+'/'
+    module.INTERACTION_MAPPING = str(PIPELINE_DIR / 'mapping' / 'interaction_mapping.csv')
+
+    module.load_data_into_db()
+    module.map_city_tier()
+    module.map_categorical_vars()
+    module.interactions_mapping()
+    return module
+
+
+@pytest.fixture(scope="module")
+def pipeline_cnx(pipeline_utils, connect_with_test_cases):
+    """_summary_
+    This fixture opens a read only connection to the db written by the data
+    pipeline, with the in-memory copy of the test cases attached as 'ut'.
+
+    INPUT
+        pipeline_utils : the data pipeline's utils module, already run
+        connect_with_test_cases : function opening the connection
+
+    """
+    return connect_with_test_cases(Path(pipeline_utils.DB_PATH, pipeline_utils.DB_FILE_NAME).as_uri())
+
+
+###############################################################################
+# Write the test case for every stage of the data pipeline
+# ##############################################################################
+
+@pytest.mark.parametrize('table,test_case,stage', CASES,
+                         ids=[stage.__name__ for _, _, stage in CASES])
+def test_data_pipeline_stage(pipeline_cnx, table, test_case, stage):
+    """_summary_
+    This function checks if a stage of the data pipeline airflow runs writes
+    the same rows, in the same order, as the test case provided in the db,
+    e.g. 'interactions_mapped' with 'interactions_mapped_test_case'. The
+    values are compared by sqlite, so the interaction counts the pipeline
+    stores as REAL match the INTEGER ones of the test cases.
+
+    INPUT
+        pipeline_cnx : connection to the data pipeline's db with the test cases attached as 'ut'
+        table : name of the table written by the stage
+        test_case : name of the test case table
+        stage : function of the tests' copy of the pipeline named as the stage
+
+    """
+    assert _columns(pipeline_cnx, table) == _columns(pipeline_cnx, f'ut.{test_case}')
+
+    n_table, n_test_case, n_common = _count_rows(pipeline_cnx, table, test_case,
+                                                 ordered=table not in UNORDERED_TABLES)
+    assert n_table == n_test_case == n_common, _describe_differences(pipeline_cnx, table, test_case)
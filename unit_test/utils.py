@@ -67,7 +67,7 @@ def build_dbs():
 # Define function to load the csv file to the database
 # ##############################################################################
 
-def load_data_into_db():
+def load_data_into_db(conn=None):
     '''
     Thie function loads the data present in datadirectiry into the db
     which was created previously.
@@ -78,6 +78,8 @@ def load_data_into_db():
     INPUTS
         db_file_name : Name of the database file
         db_path : path where the db file should be
+        conn : optional open connection to the db, used instead of opening
+               a new one and left open
         data_directory : path of the directory where 'leadscoring.csv' 
                         file is present
         
@@ -91,7 +93,7 @@ def load_data_into_db():
     SAMPLE USAGE
         load_data_into_db()
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    cnx = conn if conn is not None else sqlite3.connect(DB_PATH+DB_FILE_NAME)
     
     df_lead_scoring = pd.read_csv(DATA_DIRECTORY)
 
@@ -100,14 +102,15 @@ def load_data_into_db():
 
     df_lead_scoring.to_sql(name='loaded_data', con=cnx, if_exists='replace', index=False)
 
-    cnx.close()
+    if conn is None:
+        cnx.close()
 
 ###############################################################################
 # Define function to map cities to their respective tiers
 # ##############################################################################
 
     
-def map_city_tier():
+def map_city_tier(conn=None):
     '''
     This function maps all the cities to their respective tier as per the
     mappings provided in /mappings/city_tier_mapping.py file. If a
@@ -119,6 +122,8 @@ def map_city_tier():
     INPUTS
         db_file_name : Name of the database file
         db_path : path where the db file should be
+        conn : optional open connection to the db, used instead of opening
+               a new one and left open
         city_tier_mapping : a dictionary that maps the cities to their tier
 
     
@@ -132,7 +137,7 @@ def map_city_tier():
         map_city_tier()
 
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    cnx = conn if conn is not None else sqlite3.connect(DB_PATH+DB_FILE_NAME)
     df_lead_scoring = pd.read_sql('select * from loaded_data', cnx)
     
     df_lead_scoring["city_tier"] = df_lead_scoring["city_mapped"].map(city_tier_mapping)
@@ -141,7 +146,8 @@ def map_city_tier():
     
     df_lead_scoring.to_sql(name='city_tier_mapped', con=cnx,
                            if_exists='replace', index=False)
-    cnx.close()
+    if conn is None:
+        cnx.close()
 
     
     
@@ -151,7 +157,7 @@ def map_city_tier():
 # ##############################################################################
 
 
-def map_categorical_vars():
+def map_categorical_vars(conn=None):
     '''
     This function maps all the unsugnificant variables present in 'first_platform_c'
     'first_utm_medium_c' and 'first_utm_source_c'. The list of significant variables
@@ -162,6 +168,8 @@ def map_categorical_vars():
     INPUTS
         db_file_name : Name of the database file
         db_path : path where the db file should be
+        conn : optional open connection to the db, used instead of opening
+               a new one and left open
         list_platform : list of all the significant platform.
         list_medium : list of all the significat medium
         list_source : list of all rhe significant source
@@ -182,7 +190,7 @@ def map_categorical_vars():
     SAMPLE USAGE
         map_categorical_vars()
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    cnx = conn if conn is not None else sqlite3.connect(DB_PATH+DB_FILE_NAME)
     df_lead_scoring = pd.read_sql('select * from city_tier_mapped', cnx)
     
     # all the levels below 90 percentage are assgined to a single level called others
@@ -204,14 +212,15 @@ def map_categorical_vars():
     df = pd.concat([new_df, old_df]) # concatenate new_df and old_df to get the final dataframe
     
     df.to_sql(name='categorical_variables_mapped', con=cnx, if_exists='replace', index=False)
-    cnx.close()
+    if conn is None:
+        cnx.close()
 
     
 
 ##############################################################################
 # Define function that maps interaction columns into 4 types of interactions
 # #############################################################################
-def interactions_mapping():
+def interactions_mapping(conn=None):
     '''
     This function maps the interaction columns into 4 unique interaction columns
     These mappings are present in 'interaction_mapping.csv' file. 
@@ -220,6 +229,8 @@ def interactions_mapping():
     INPUTS
         db_file_name : Name of the database file
         db_path : path where the db file should be
+        conn : optional open connection to the db, used instead of opening
+               a new one and left open
         interaction_mapping_file : path to the csv file containing interaction's
                                    mappings
         index_columns : list of columns to be used as index while pivoting and
@@ -244,7 +255,7 @@ def interactions_mapping():
     SAMPLE USAGE
         interactions_mapping()
     '''
-    cnx = sqlite3.connect(DB_PATH+DB_FILE_NAME)
+    cnx = conn if conn is not None else sqlite3.connect(DB_PATH+DB_FILE_NAME)
     df = pd.read_sql('select * from categorical_variables_mapped', cnx)
     
     df_event_mapping = pd.read_csv(INTERACTION_MAPPING, index_col=[0])
@@ -267,4 +278,5 @@ def interactions_mapping():
     df_pivot = df_pivot.reset_index()
 
     df_pivot.to_sql(name='interactions_mapped', con=cnx, if_exists='replace', index=False)
-    cnx.close()
+    if conn is None:
+        cnx.close()